@@ -6,10 +6,14 @@ import scipy
 General methods for computing property statistics from a list of values
 """
 
+from functools import lru_cache
+from inspect import signature
+
 import numpy as np
 from scipy import stats
 
-from six import string_types
+# SciPy >= 1.9 can return the mode as a scalar, rather than a 1-element array
+_MODE_HAS_KEEPDIMS = "keepdims" in signature(stats.mode).parameters
 
 
 class PropertyStats(object):
@@ -34,13 +38,29 @@ class PropertyStats(object):
     You can, of course, call the statistical functions directly. All take at
     least two arguments.  The first is the data being assessed and the second,
     optional, argument is the weights.
+
+    If the same short lists of values recur many times (e.g., the elemental
+    properties of compositions in a dataset with many duplicates), the
+    results of ``calc_stat`` can be cached by setting::
+
+        PropertyStats.cache_stats = True
+
+    Caching is off by default, as it slows down computing statistics for
+    lists that are never repeated.
     """
 
+    cache_stats = False
+
     @staticmethod
     def calc_stat(data_lst, stat, weights=None):
         """
         Compute a property statistic
 
+        The values and weights are converted to float64 arrays before the
+        statistic is computed, so integer data gives float results and
+        missing (None) entries become NaN. The exception is ``mode``, which
+        returns one of the input values and so keeps their type.
+
         Args:
             data_lst (list of floats): list of values
             stat (str) - Name of property to be compute. If there are arguments to the statistics function, these
@@ -50,9 +70,90 @@ class PropertyStats(object):
         Returns:
             float - Desired statistic
         """
-        statistics = stat.split("::")
-        return getattr(PropertyStats, statistics[0])(data_lst, weights,
-                                                     *statistics[1:])
+        fn, args = _parse_stat(stat)
+        if fn is PropertyStats.mode:
+            return fn(data_lst, weights, *args)
+
+        # Convert the inputs once, so that the statistics functions do not
+        # each make their own copy of the data
+        data_lst = np.ascontiguousarray(data_lst, dtype=np.float64)
+        if weights is not None:
+            weights = np.ascontiguousarray(weights, dtype=np.float64)
+
+        # Each cache miss costs converting the inputs to bytes and storing
+        # the result on top of computing the statistic. Warnings raised while
+        # computing a statistic (e.g., log of zero) only appear on the miss
+        if PropertyStats.cache_stats and data_lst.ndim == 1 and \
+                len(data_lst) <= _STAT_CACHE_MAX_LEN:
+            result = _cached_stat(stat, data_lst.tobytes(),
+                                  None if weights is None
+                                  else weights.tobytes())
+            # Do not hand out the cached copy of mutable results
+            if isinstance(result, (np.ndarray, list)):
+                result = result.copy()
+            return result
+        return fn(data_lst, weights, *args)
+
+    @staticmethod
+    def calc_stats_batch(data, mask, stat_lst, weights=None):
+        """
+        Compute property statistics for many lists of values at once
+
+        The lists are stored as the rows of a padded 2D array, along with a
+        mask marking which entries of each row hold data. Common statistics
+        (minimum, maximum, range, mean, inverse_mean, avg_dev, std_dev and
+        holder_mean) are computed for all rows with a single vectorized
+        operation. Other statistics are computed row by row. Only statistics
+        that return a single number are supported; statistics returning
+        arrays (e.g., sorted or eigenvalues) raise a ValueError.
+
+        Args:
+            data (2D array of floats): (N, M) values, padded to equal length
+            mask (2D array of bools): (N, M) True for entries holding data
+            stat_lst ([str]): Names of the statistics to compute, in the format
+                used by ``calc_stat``
+            weights (2D array of floats): (Optional) (N, M) weights for each
+                entry in data
+        Returns:
+            (np.ndarray) - (N, len(stat_lst)) array of statistics
+        """
+        parsed = [_parse_stat(stat) for stat in stat_lst]
+        for stat, (fn, _) in zip(stat_lst, parsed):
+            if fn in _ARRAY_STATS:
+                raise ValueError("calc_stats_batch only supports statistics "
+                                 "returning a single value, not '{}'"
+                                 .format(stat))
+
+        data = np.asarray(data, dtype=np.float64)
+        mask = np.asarray(mask, dtype=bool)
+        weighted = weights is not None
+
+        # Padding is replaced by 1 so it stays finite under log, reciprocal
+        # and power. It carries zero weight in every reduction
+        x = np.where(mask, data, 1.0)
+        w = np.where(mask, weights, 0.0) if weighted \
+            else mask.astype(np.float64)
+
+        # Statistics that share intermediate results are computed together
+        # when more than one of them is requested
+        if len(_FUSED_STATS.intersection(stat_lst)) > 1:
+            fused = _batch_fused_stats(x, w, mask, weighted, stat_lst)
+        else:
+            fused = {}
+
+        output = np.empty((data.shape[0], len(stat_lst)))
+        for i, (stat, (fn, args)) in enumerate(zip(stat_lst, parsed)):
+            batch_fn = _BATCH_STAT_TABLE.get(fn)
+            if stat in fused:
+                output[:, i] = fused[stat]
+            elif batch_fn is not None:
+                output[:, i] = batch_fn(x, w, mask, weighted, *args)
+            else:
+                for row in range(data.shape[0]):
+                    output[row, i] = fn(data[row, mask[row]],
+                                        w[row, mask[row]] if weighted
+                                        else None, *args)
+        return output
 
     @staticmethod
     def minimum(data_lst, weights=None):
@@ -64,7 +165,8 @@ class PropertyStats(object):
         Returns:
             minimum value
         """
-        return min(data_lst) if not np.any(np.isnan(data_lst)) else float("nan")
+        # NumPy reductions propagate NaN, so no separate check is needed
+        return np.asarray(data_lst, dtype=np.float64).min()
 
     @staticmethod
     def maximum(data_lst, weights=None):
@@ -76,7 +178,7 @@ class PropertyStats(object):
         Returns:
             maximum value
         """
-        return max(data_lst) if not np.any(np.isnan(data_lst)) else float("nan")
+        return np.asarray(data_lst, dtype=np.float64).max()
 
     @staticmethod
     def range(data_lst, weights=None):
@@ -88,8 +190,7 @@ class PropertyStats(object):
         Returns:
             range
         """
-        return (max(data_lst) - min(data_lst)) if not np.any(np.isnan(data_lst)) \
-            else float("nan")
+        return np.ptp(np.asarray(data_lst, dtype=np.float64))
 
     @staticmethod
     def mean(data_lst, weights=None):
@@ -113,7 +214,11 @@ class PropertyStats(object):
         Returns:
             inverse mean
         """
-        return PropertyStats.mean([1.0 / x for x in data_lst], weights=weights)
+        inverse = np.reciprocal(np.asarray(data_lst, dtype=np.float64))
+        if weights is None:
+            return inverse.mean()
+        weights = np.asarray(weights, dtype=np.float64)
+        return np.dot(weights, inverse) / weights.sum()
 
     @staticmethod
     def avg_dev(data_lst, weights=None):
@@ -129,8 +234,15 @@ class PropertyStats(object):
         Returns:
             mean absolute deviation
         """
-        mean = PropertyStats.mean(data_lst, weights)
-        return np.average(np.abs(np.subtract(data_lst, mean)), weights=weights)
+        x = np.asarray(data_lst, dtype=np.float64)
+        if weights is None:
+            dev = x - x.mean()
+            return np.abs(dev, out=dev).mean()
+        else:
+            w = np.asarray(weights, dtype=np.float64)
+            total_weight = w.sum()
+            dev = x - np.dot(w, x) / total_weight
+            return np.dot(w, np.abs(dev, out=dev)) / total_weight
 
     @staticmethod
     def std_dev(data_lst, weights=None):
@@ -150,12 +262,13 @@ class PropertyStats(object):
         if weights is None:
             return np.std(data_lst)
         else:
-            beta = np.sum(weights) / (
-                        np.sum(weights) ** 2 - np.sum(np.power(weights, 2)))
-            dev = np.power(np.subtract(data_lst, PropertyStats.mean(data_lst,
-                                                                    weights=weights)),
-                           2)
-            return np.sqrt(beta * np.dot(dev, weights))
+            # Reduce with dot products to avoid building temporary arrays
+            x = np.asarray(data_lst, dtype=np.float64)
+            w = np.asarray(weights, dtype=np.float64)
+            total_weight = w.sum()
+            beta = total_weight / (total_weight ** 2 - np.dot(w, w))
+            dev = x - np.dot(w, x) / total_weight
+            return np.sqrt(beta * np.dot(w, dev * dev))
 
     @staticmethod
     def skewness(data_lst, weights=None):
@@ -229,16 +342,20 @@ class PropertyStats(object):
             geometric standard deviation
         """
 
+        log_x = np.log(np.asarray(data_lst, dtype=np.float64))
+
         # Make fake weights, if none are provided
         if weights is None:
-            weights = np.ones_like(data_lst)
+            weights = np.ones_like(log_x)
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
 
-        # Compute the geometric std dev
-        mean = PropertyStats.holder_mean(data_lst, weights, 0)
-        beta = np.sum(weights) / (
-                    np.sum(weights) ** 2 - np.sum(np.power(weights, 2)))
-        dev = np.log(np.true_divide(data_lst, mean))
-        return np.sqrt(np.exp(beta * np.dot(weights, np.power(dev, 2))))
+        # Compute the geometric std dev. The log of the geometric mean is the
+        # weighted mean of the logs, so log(x / mean) needs no extra pass
+        total_weight = weights.sum()
+        beta = total_weight / (total_weight ** 2 - np.dot(weights, weights))
+        dev = log_x - np.dot(weights, log_x) / total_weight
+        return np.sqrt(np.exp(beta * np.dot(weights, dev * dev)))
 
     @staticmethod
     def mode(data_lst, weights=None):
@@ -255,16 +372,65 @@ class PropertyStats(object):
             mode
         """
         if weights is None:
-            return stats.mode(data_lst).mode[0]
+            if _MODE_HAS_KEEPDIMS:
+                return stats.mode(data_lst, axis=None, keepdims=False).mode
+            return stats.mode(data_lst, axis=None).mode[0]
         else:
             # Find the entry(s) with the largest weight
-            data_lst = np.array(data_lst)
-            weights = np.array(weights)
+            data_lst = np.asarray(data_lst)
+            weights = np.asarray(weights)
             most_freq = np.isclose(weights, weights.max())
 
             # Return the minimum of the most-frequent entries
             return data_lst[most_freq].min()
 
+    @staticmethod
+    def n_numerical_modes(data_lst, weights=None, n=2, dl=0.1):
+        """Most frequent values of a list, determined by binning the data
+        into a coarse-grained frequency distribution.
+
+        Args:
+            data_lst (list of floats): List of values to be assessed
+            weights (list of floats): Weights for each value
+            n (int): Number of modes to return
+            dl (float): Bin width of the frequency distribution
+        Returns:
+            ([float]) lower edges of the n most-populated bins, in order of
+            decreasing frequency. Padded with NaN if there are fewer bins
+            than requested modes, and all NaN if data_lst contains NaN
+        """
+        n = int(n)
+        dl = float(dl)
+        if n < 1:
+            raise ValueError("Number of modes must be at least 1.")
+        if dl <= 0:
+            raise ValueError("Bin width must be positive.")
+        x = np.asarray(data_lst, dtype=np.float64)
+        if len(x) == 0:
+            raise ValueError("Data list is empty.")
+        if np.isnan(x).any():
+            return n * [float("nan")]
+
+        lo = x.min()
+        width = np.ptp(x)
+        if width == 0:
+            return [lo] + (n - 1) * [float("nan")]
+
+        # Build evenly-spaced bins with linspace to avoid accumulating
+        # floating-point error in the bin edges
+        n_bins = int(np.ceil(width / dl))
+        bins = np.linspace(lo, lo + n_bins * dl, n_bins + 1)
+        # Rounding can leave the last edge just below the maximum
+        bins[-1] = max(bins[-1], x.max())
+        hist, bins = np.histogram(x, bins=bins, weights=weights)
+
+        # Select the n largest bins in linear time, then order only those
+        k = min(n, len(hist))
+        top = np.argpartition(hist, -k)[-k:]
+        top = top[np.argsort(hist[top], kind="stable")[::-1]]
+        modes = list(bins[top])
+        return modes + (n - k) * [float("nan")]
+
     @staticmethod
     def holder_mean(data_lst, weights=None, power=1):
         """
@@ -272,39 +438,48 @@ class PropertyStats(object):
         Args:
             data_lst: (list/array) of values
             weights: (list/array) of weights
-            power: (int/float/str) which holder mean to compute
+            power: (int/float) which holder mean to compute
         Returns: Holder mean
         """
-
-        if isinstance(power, string_types):
-            power = float(power)
+        x = np.asarray(data_lst, dtype=np.float64)
 
         if weights is None:
-            if power == -1:
-                return scipy.stats.hmean(data_lst)
+            if power == 1:
+                return x.mean()
+            elif power == 2:
+                return np.sqrt(np.dot(x, x) / len(x))
+            elif power == 0.5:
+                return np.mean(np.sqrt(x)) ** 2
+            elif power == -1:
+                return scipy.stats.hmean(x)
             elif power == 0:
-                return stats.mstats.gmean(data_lst)
+                with np.errstate(divide="ignore"):
+                    return np.exp(np.mean(np.log(x)))
             else:
-                return np.power(np.mean(np.power(data_lst, power)), 1.0 / power)
+                return np.power(np.mean(np.power(x, power)), 1.0 / power)
         else:
             # Compute the normalization factor
-            alpha = sum(weights)
-
-            if power == -1:
-                denom = 0
-                for idx, x in enumerate(data_lst):
-                    denom += weights[idx] / x
-
-                return sum(weights) / denom
-
-            # If power=0, return geometric mean
+            w = np.asarray(weights, dtype=np.float64)
+            alpha = w.sum()
+
+            if power == 1:
+                return np.dot(w, x) / alpha
+            elif power == 2:
+                return np.sqrt(np.dot(w, x * x) / alpha)
+            elif power == 0.5:
+                return (np.dot(w, np.sqrt(x)) / alpha) ** 2
+            elif power == -1:
+                return alpha / np.dot(w, np.reciprocal(x))
+
+            # If power=0, return geometric mean, computed from the weighted
+            # mean of the logs. Entries with zero weight are skipped, as in
+            # the product of powers x ** 0 = 1 even for x = 0
             elif power == 0:
-                return np.product(np.power(data_lst, np.true_divide(weights,
-                                                                    np.sum(
-                                                                        weights))))
+                with np.errstate(divide="ignore"):
+                    log_x = np.log(x, out=np.zeros_like(x), where=w != 0)
+                return np.exp(np.dot(w, log_x) / alpha)
             else:
-                return np.power(np.sum(
-                    np.multiply(weights, np.power(data_lst, power))) / alpha,
+                return np.power(np.dot(w, np.power(x, power)) / alpha,
                                 1.0 / power)
 
     @staticmethod
@@ -314,6 +489,36 @@ class PropertyStats(object):
         """
         return np.sort(data_lst)
 
+    @staticmethod
+    def order_stats(data_lst, weights=None, k_low=0, k_high=0):
+        """
+        Returns the k_low smallest and k_high largest values of data_lst.
+
+        Uses a linear-time partition rather than sorting the whole list, so
+        it is faster than ``sorted`` when only a few values are needed.
+
+        Args:
+            data_lst (list of floats): List of values to be assessed
+            weights: (ignored)
+            k_low (int): Number of smallest values to return
+            k_high (int): Number of largest values to return
+        Returns:
+            (np.ndarray) the k_low smallest values followed by the k_high
+            largest values, each in ascending order
+        """
+        k_low, k_high = int(k_low), int(k_high)
+        if k_low < 0 or k_high < 0:
+            raise ValueError("Number of values to return must be "
+                             "non-negative.")
+        x = np.asarray(data_lst, dtype=np.float64)
+        k_low = min(k_low, len(x))
+        k_high = min(k_high, len(x))
+        low = np.sort(np.partition(x, k_low - 1)[:k_low]) if k_low \
+            else x[:0]
+        high = np.sort(np.partition(x, -k_high)[-k_high:]) if k_high \
+            else x[:0]
+        return np.concatenate((low, high))
+
     @staticmethod
     def eigenvalues(data_lst, symm=False, sort=False):
         """
@@ -330,6 +535,23 @@ class PropertyStats(object):
             eigs.sort()
         return eigs
 
+    @staticmethod
+    def eigenvalues_batch(data_lst, symm=True, sort=True):
+        """
+        Return the eigenvalues of a stack of matrices with a single
+        call to LAPACK
+        Args:
+            data_lst: (array-like) of shape (N, M, M) of values
+            symm: whether to assume the matrices are symmetric
+            sort: whether to sort the eigenvalues of each matrix
+        Returns: (N, M) array of eigenvalues
+        """
+        eigs = np.linalg.eigvalsh(data_lst) if symm else np.linalg.eigvals(
+            data_lst)
+        if sort:
+            eigs.sort(axis=-1)
+        return eigs
+
     @staticmethod
     def flatten(data_lst, weights=None):
         """Returns a flattened copy of data_lst-as a numpy array
@@ -349,3 +571,179 @@ class PropertyStats(object):
         """
         q = float(q)
         return np.quantile(data_lst, q=q)
+
+
+# Lookup table from statistic name to the function computing it, built once
+# so that calc_stat does not need a getattr call for each statistic
+_STAT_TABLE = {name: getattr(PropertyStats, name)
+               for name, attr in vars(PropertyStats).items()
+               if isinstance(attr, staticmethod)
+               and name not in ("calc_stat", "calc_stats_batch")}
+
+
+def _to_number(arg):
+    """Convert a statistic argument to a float, if it looks numeric"""
+    try:
+        return float(arg)
+    except ValueError:
+        return arg
+
+
+@lru_cache(maxsize=256)
+def _parse_stat(stat):
+    """Parse a statistic string (e.g., "holder_mean::2") into the function
+    computing it and the arguments to pass along with the data
+
+    Args:
+        stat (str): Name of the statistic, followed by any arguments
+    Returns:
+        (function, tuple) function computing the statistic and its arguments
+    """
+    statistics = stat.split("::")
+    try:
+        fn = _STAT_TABLE[statistics[0]]
+    except KeyError:
+        raise AttributeError("PropertyStats has no statistic named '{}'"
+                             .format(statistics[0]))
+    return fn, tuple(_to_number(a) for a in statistics[1:])
+
+
+# Longest list of values whose statistics are cached by calc_stat
+_STAT_CACHE_MAX_LEN = 32
+
+
+@lru_cache(maxsize=100000)
+def _cached_stat(stat, data_bytes, weights_bytes):
+    """Compute a statistic for data and weights stored as raw float64 bytes,
+    which (unlike arrays) can be used as keys of the cache
+
+    Args:
+        stat (str): Name of the statistic, followed by any arguments
+        data_bytes (bytes): Values to be assessed
+        weights_bytes (bytes): Weights for each value, or None
+    Returns:
+        Desired statistic
+    """
+    fn, args = _parse_stat(stat)
+    data_lst = np.frombuffer(data_bytes, dtype=np.float64)
+    weights = None if weights_bytes is None \
+        else np.frombuffer(weights_bytes, dtype=np.float64)
+    return fn(data_lst, weights, *args)
+
+
+# Row-wise versions of the statistics used by calc_stats_batch. Each takes
+# the padded data, the weights (zero for padding), the mask and whether the
+# caller supplied weights, followed by any arguments of the statistic
+
+def _batch_minimum(x, w, mask, weighted):
+    return np.where(mask, x, np.inf).min(axis=1)
+
+
+def _batch_maximum(x, w, mask, weighted):
+    return np.where(mask, x, -np.inf).max(axis=1)
+
+
+def _batch_range(x, w, mask, weighted):
+    return _batch_maximum(x, w, mask, weighted) - \
+        _batch_minimum(x, w, mask, weighted)
+
+
+def _batch_mean(x, w, mask, weighted):
+    return np.einsum("ij,ij->i", w, x) / w.sum(axis=1)
+
+
+def _batch_inverse_mean(x, w, mask, weighted):
+    return np.einsum("ij,ij->i", w, np.reciprocal(x)) / w.sum(axis=1)
+
+
+def _batch_avg_dev(x, w, mask, weighted):
+    dev = np.abs(x - _batch_mean(x, w, mask, weighted)[:, None])
+    return np.einsum("ij,ij->i", w, dev) / w.sum(axis=1)
+
+
+def _batch_std_dev(x, w, mask, weighted):
+    dev = x - _batch_mean(x, w, mask, weighted)[:, None]
+    return _std_dev_from_dev(dev, w, mask, weighted)
+
+
+def _std_dev_from_dev(dev, w, mask, weighted):
+    """Row-wise std_dev, given the deviation of each entry from the mean"""
+    total_weight = w.sum(axis=1)
+    var = np.einsum("ij,ij->i", w, dev * dev)
+    # Rows with a single entry divide by zero here; they are replaced below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if weighted:
+            var *= total_weight / (total_weight ** 2 -
+                                   np.einsum("ij,ij->i", w, w))
+        else:
+            var /= total_weight
+    return np.where(mask.sum(axis=1) == 1, 0.0, np.sqrt(var))
+
+
+def _batch_fused_stats(x, w, mask, weighted, stat_lst):
+    """Compute the requested statistics among minimum, maximum, range, mean,
+    avg_dev and std_dev together, computing each shared intermediate (the
+    masked extrema, the mean and the deviations from the mean) only if one
+    of the requested statistics needs it
+
+    Returns:
+        (dict) statistic name to the (N,) array of its values, for each
+        requested statistic
+    """
+    requested = _FUSED_STATS.intersection(stat_lst)
+    fused = {}
+
+    if requested.intersection(["minimum", "range"]):
+        fused["minimum"] = _batch_minimum(x, w, mask, weighted)
+    if requested.intersection(["maximum", "range"]):
+        fused["maximum"] = _batch_maximum(x, w, mask, weighted)
+    if "range" in requested:
+        fused["range"] = fused["maximum"] - fused["minimum"]
+
+    if requested.intersection(["mean", "avg_dev", "std_dev"]):
+        fused["mean"] = _batch_mean(x, w, mask, weighted)
+        if requested.intersection(["avg_dev", "std_dev"]):
+            dev = x - fused["mean"][:, None]
+            if "std_dev" in requested:
+                fused["std_dev"] = _std_dev_from_dev(dev, w, mask, weighted)
+            if "avg_dev" in requested:
+                fused["avg_dev"] = np.einsum("ij,ij->i", w, np.abs(dev)) / \
+                    w.sum(axis=1)
+
+    return {stat: fused[stat] for stat in requested}
+
+
+def _batch_holder_mean(x, w, mask, weighted, power=1):
+    power = float(power)
+    total_weight = w.sum(axis=1)
+    if power == 0:
+        # Skip entries with zero weight, as in holder_mean
+        with np.errstate(divide="ignore"):
+            log_x = np.log(x, out=np.zeros_like(x), where=w != 0)
+        return np.exp(np.einsum("ij,ij->i", w, log_x) / total_weight)
+    elif power == -1:
+        return total_weight / np.einsum("ij,ij->i", w, np.reciprocal(x))
+    return np.power(np.einsum("ij,ij->i", w, np.power(x, power)) /
+                    total_weight, 1.0 / power)
+
+
+_BATCH_STAT_TABLE = {
+    PropertyStats.minimum: _batch_minimum,
+    PropertyStats.maximum: _batch_maximum,
+    PropertyStats.range: _batch_range,
+    PropertyStats.mean: _batch_mean,
+    PropertyStats.inverse_mean: _batch_inverse_mean,
+    PropertyStats.avg_dev: _batch_avg_dev,
+    PropertyStats.std_dev: _batch_std_dev,
+    PropertyStats.holder_mean: _batch_holder_mean,
+}
+
+# Statistics that return an array, which calc_stats_batch cannot store
+_ARRAY_STATS = frozenset([PropertyStats.sorted, PropertyStats.flatten,
+                          PropertyStats.order_stats,
+                          PropertyStats.n_numerical_modes,
+                          PropertyStats.eigenvalues,
+                          PropertyStats.eigenvalues_batch])
+
+_FUSED_STATS = frozenset(["minimum", "maximum", "range", "mean", "avg_dev",
+                          "std_dev"])
@@ -2,10 +2,11 @@ from __future__ import unicode_literals, division, print_function
 
 from math import sqrt
 from unittest import TestCase
+from unittest.mock import patch
 
 import numpy as np
 
-from matminer.featurizers.utils.stats import PropertyStats
+from matminer.featurizers.utils.stats import PropertyStats, _cached_stat
 
 
 class TestPropertyStats(TestCase):
@@ -39,6 +40,33 @@ class TestPropertyStats(TestCase):
                                PropertyStats.calc_stat(self.sample_2, statistic,
                                                        self.sample_2_weights))
 
+    def test_calc_stat_cache(self):
+        PropertyStats.cache_stats = True
+        self.addCleanup(setattr, PropertyStats, "cache_stats", False)
+        _cached_stat.cache_clear()
+
+        data = [3, 1, 2]
+        self.assertAlmostEqual(2, PropertyStats.calc_stat(data, "mean"))
+        self.assertAlmostEqual(2.5, PropertyStats.calc_stat(data, "mean",
+                                                             [1, 0, 1]))
+
+        # Modifying a returned array must not change later results
+        result = PropertyStats.calc_stat(data, "sorted")
+        result[0] = 10
+        np.testing.assert_array_equal([1, 2, 3],
+                                      PropertyStats.calc_stat(data, "sorted"))
+
+        # Long lists are not cached, but give the same results
+        data = list(range(100))
+        self.assertAlmostEqual(49.5, PropertyStats.calc_stat(data, "mean"))
+
+        self.assertEqual(3, _cached_stat.cache_info().currsize)
+
+        # Nothing is cached unless requested
+        PropertyStats.cache_stats = False
+        PropertyStats.calc_stat([4, 5], "mean")
+        self.assertEqual(3, _cached_stat.cache_info().currsize)
+
     def test_minimum(self):
         self._run_test("minimum", 1, 1, 0, 0)
 
@@ -48,9 +76,20 @@ class TestPropertyStats(TestCase):
     def test_range(self):
         self._run_test("range", 0, 0, 1.5, 1.5)
 
+    def test_nan(self):
+        for stat in ["minimum", "maximum", "range"]:
+            self.assertTrue(np.isnan(PropertyStats.calc_stat(
+                [1, np.nan, 2], stat)))
+
     def test_mean(self):
         self._run_test("mean", 1, 1, 2. / 3, 5. / 7)
 
+    def test_inverse_mean(self):
+        self.assertAlmostEqual(0.75, PropertyStats.calc_stat(
+            [1, 2], "inverse_mean"))
+        self.assertAlmostEqual(2. / 3, PropertyStats.calc_stat(
+            [1, 2], "inverse_mean", [1, 2]))
+
     def test_avg_dev(self):
         self._run_test("avg_dev", 0, 0, 5. / 9, 0.448979592)
 
@@ -69,11 +108,50 @@ class TestPropertyStats(TestCase):
         # Additional tests
         self.assertAlmostEqual(0, PropertyStats.mode([0, 1, 2], [1, 1, 1]))
 
+        # The mode is one of the input values, including its type
+        self.assertIsInstance(PropertyStats.calc_stat([1, 2, 2, 3], "mode"),
+                              (int, np.integer))
+        self.assertIsInstance(PropertyStats.calc_stat([1, 2, 3], "mode",
+                                                      [1, 2, 1]),
+                              (int, np.integer))
+
+    def test_n_numerical_modes(self):
+        data = [0, 0.05, 0.5, 0.52, 0.55, 1.0]
+        np.testing.assert_array_almost_equal(
+            [0.5, 0], PropertyStats.n_numerical_modes(data))
+        np.testing.assert_array_almost_equal(
+            [0.5, 0, 0.75],
+            PropertyStats.calc_stat(data, "n_numerical_modes::3::0.25"))
+
+        # The maximum is counted even if the bin edges round below it
+        modes = PropertyStats.n_numerical_modes([0, 0.9, 0.9], n=1, dl=0.3)
+        self.assertAlmostEqual(0.6, modes[0])
+
+        with self.assertRaises(ValueError):
+            PropertyStats.n_numerical_modes(data, n=0)
+        for dl in [0, -0.1]:
+            with self.assertRaises(ValueError):
+                PropertyStats.n_numerical_modes(data, dl=dl)
+
+        # NaN in the data gives NaN modes
+        modes = PropertyStats.n_numerical_modes([0, np.nan, 1], n=3)
+        self.assertEqual(3, len(modes))
+        self.assertTrue(np.all(np.isnan(modes)))
+
+        # Data without variation has a single mode
+        modes = PropertyStats.n_numerical_modes(self.sample_1)
+        self.assertAlmostEqual(1, modes[0])
+        self.assertTrue(np.isnan(modes[1]))
+
     def test_holder_mean(self):
         self._run_test("holder_mean::0", 1, 1, np.product(self.sample_2), 0)
+        self.assertAlmostEqual(PropertyStats.holder_mean(
+            [1, 4, 0], [1, 1, 0], power=0), 2)
 
         self._run_test("holder_mean::1", 1, 1, 2. / 3, 5. / 7)
         self._run_test("holder_mean::2", 1, 1, sqrt(5. / 6), 0.88640526)
+        self._run_test("holder_mean::3", 1, 1, 1.0527266, 1.01176579)
+        self._run_test("holder_mean::0.5", 1, 1, 0.41467231, 0.56849809)
 
         # can't use run_test since it uses a sample with zero, which is not
         # allowed for Holder mean with -1
@@ -94,6 +172,94 @@ class TestPropertyStats(TestCase):
                                PropertyStats.geom_std_dev([0.5, 1.5, 1],
                                                           weights=[2, 1, 0]))
 
+    def test_order_stats(self):
+        data = [5, 1, 4, 2, 3]
+        np.testing.assert_array_equal(
+            [1, 2, 4, 5], PropertyStats.order_stats(data, k_low=2, k_high=2))
+        np.testing.assert_array_equal(
+            [1], PropertyStats.calc_stat(data, "order_stats::1::0"))
+        np.testing.assert_array_equal(
+            [3, 4, 5], PropertyStats.calc_stat(data, "order_stats::0::3"))
+        np.testing.assert_array_equal(
+            PropertyStats.sorted(data),
+            PropertyStats.order_stats(data, k_low=10))
+
+        with self.assertRaises(ValueError):
+            PropertyStats.order_stats(data, k_low=-1)
+        with self.assertRaises(ValueError):
+            PropertyStats.order_stats(data, k_high=-1)
+
+    def test_eigenvalues_batch(self):
+        batch = np.random.RandomState(0).uniform(-1, 1, (5, 3, 3))
+        batch += batch.transpose(0, 2, 1)
+        eigs = PropertyStats.eigenvalues_batch(batch)
+        self.assertEqual((5, 3), eigs.shape)
+        for m, e in zip(batch, eigs):
+            np.testing.assert_array_almost_equal(
+                PropertyStats.eigenvalues(m, symm=True, sort=True), e)
+
     def test_quantile(self):
         self._run_test("quantile::0.5", 1, 1, 0.5, 0.5)
         self._run_test("quantile::0.3", 1, 1, 0.3, 0.3)
+
+    def test_calc_stats_batch(self):
+        rows = [self.sample_1, self.sample_2, [2.5], [0.5, 3, 2, 1]]
+        row_weights = [self.sample_1_weights, self.sample_2_weights, [2],
+                       [1, 0.5, 0.25, 2]]
+        stat_lst = ["minimum", "maximum", "range", "mean", "avg_dev",
+                    "std_dev", "holder_mean::2", "quantile::0.3"]
+
+        # Pad the rows to a common length
+        data = np.zeros((len(rows), 4))
+        weights = np.zeros((len(rows), 4))
+        mask = np.zeros((len(rows), 4), dtype=bool)
+        for i, (row, w) in enumerate(zip(rows, row_weights)):
+            data[i, :len(row)] = row
+            weights[i, :len(row)] = w
+            mask[i, :len(row)] = True
+
+        for w, w_rows in [(None, [None] * len(rows)), (weights, row_weights)]:
+            result = PropertyStats.calc_stats_batch(data, mask, stat_lst, w)
+            self.assertEqual((len(rows), len(stat_lst)), result.shape)
+            for i, (row, row_w) in enumerate(zip(rows, w_rows)):
+                for j, stat in enumerate(stat_lst):
+                    self.assertAlmostEqual(
+                        PropertyStats.calc_stat(row, stat, row_w),
+                        result[i, j])
+
+        # Statistics computed on their own, rather than together
+        for stat in ["minimum", "range", "avg_dev", "std_dev"]:
+            np.testing.assert_array_almost_equal(
+                result[:, stat_lst.index(stat)],
+                PropertyStats.calc_stats_batch(data, mask, [stat],
+                                               weights)[:, 0])
+
+        # Statistics that do not need the mean do not compute it
+        with patch("matminer.featurizers.utils.stats._batch_mean",
+                   side_effect=AssertionError("mean was computed")):
+            result = PropertyStats.calc_stats_batch(
+                data, mask, ["minimum", "maximum"], weights)
+        np.testing.assert_array_almost_equal([1, 0, 2.5, 0.5], result[:, 0])
+        np.testing.assert_array_almost_equal([1, 1.5, 2.5, 3], result[:, 1])
+
+        # Statistics returning arrays cannot be stored
+        for stat in ["sorted", "order_stats::1::1", "n_numerical_modes"]:
+            with self.assertRaises(ValueError):
+                PropertyStats.calc_stats_batch(data, mask, [stat])
+
+        # Zero values with zero weight are skipped by the geometric mean
+        self.assertAlmostEqual(
+            PropertyStats.calc_stat([1, 4, 0], "holder_mean::0", [1, 1, 0]),
+            PropertyStats.calc_stats_batch([[1, 4, 0]], [[1, 1, 1]],
+                                           ["holder_mean::0"],
+                                           [[1, 1, 0]])[0, 0])
+
+        # Holder means that need strictly positive data
+        stat_lst = ["inverse_mean", "holder_mean::0", "holder_mean::-1"]
+        result = PropertyStats.calc_stats_batch(data[2:], mask[2:], stat_lst,
+                                                weights[2:])
+        for i, (row, row_w) in enumerate(zip(rows[2:], row_weights[2:])):
+            for j, stat in enumerate(stat_lst):
+                self.assertAlmostEqual(
+                    PropertyStats.calc_stat(row, stat, row_w), result[i, j])
+
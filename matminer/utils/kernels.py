@@ -1,22 +1,50 @@
 import numpy as np
+from scipy.spatial.distance import cdist
+
 
-@staticmethod
 def laplacian_kernel(arr0, arr1, SIGMA):
     """
     Returns a Laplacian kernel of the two arrays
     for use in KRR or other regressions using the
-    kernel trick.
+    kernel trick. To evaluate the kernel between many
+    pairs of arrays, use laplacian_kernel_matrix instead.
     """
-    diff = arr0 - arr1
-    return np.exp(-np.linalg.norm(diff.A1, ord=1) / SIGMA)
+    diff = np.ravel(arr0) - np.ravel(arr1)
+    return np.exp(-np.linalg.norm(diff, ord=1) / SIGMA)
 
 
-@staticmethod
 def gaussian_kernel(arr0, arr1, SIGMA):
     """
     Returns a Gaussian kernel of the two arrays
     for use in KRR or other regressions using the
-    kernel trick.
+    kernel trick. To evaluate the kernel between many
+    pairs of arrays, use gaussian_kernel_matrix instead.
+    """
+    diff = np.ravel(arr0) - np.ravel(arr1)
+    return np.exp(-np.dot(diff, diff) / 2 / SIGMA ** 2)
+
+
+def laplacian_kernel_matrix(X, Y, SIGMA):
+    """
+    Returns the Laplacian kernel between every row of X
+    and every row of Y, as a (len(X), len(Y)) array.
     """
-    diff = arr0 - arr1
-    return np.exp(-np.linalg.norm(diff.A1, ord=2) ** 2 / 2 / SIGMA ** 2)
\ No newline at end of file
+    return np.exp(-cdist(X, Y, "cityblock") / SIGMA)
+
+
+def gaussian_kernel_matrix(X, Y, SIGMA):
+    """
+    Returns the Gaussian kernel between every row of X
+    and every row of Y, as a (len(X), len(Y)) array.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+
+    # Expand |x - y|^2 = |x|^2 + |y|^2 - 2 x.y so that the bulk of the
+    # work is a single matrix product
+    sq_dists = np.einsum("ij,ij->i", X, X)[:, None] + \
+        np.einsum("ij,ij->i", Y, Y)[None, :] - 2 * np.dot(X, Y.T)
+
+    # Rounding can leave tiny negative distances between near-equal rows
+    np.maximum(sq_dists, 0, out=sq_dists)
+    return np.exp(-sq_dists / 2 / SIGMA ** 2)
@@ -0,0 +1,52 @@
+# coding: utf-8
+
+from __future__ import division, unicode_literals, absolute_import
+import unittest
+
+import numpy as np
+
+from matminer.utils.kernels import laplacian_kernel, gaussian_kernel, \
+    laplacian_kernel_matrix, gaussian_kernel_matrix
+
+
+class KernelsTest(unittest.TestCase):
+    def setUp(self):
+        self.X = np.array([[0., 1., 2.], [1., 1., 0.5]])
+        self.Y = np.array([[0., 0., 0.], [1., 2., 3.], [0.5, 1., 2.]])
+
+    def test_laplacian_kernel(self):
+        self.assertAlmostEqual(np.exp(-3. / 2),
+                               laplacian_kernel(self.X[0], self.Y[0], 2))
+        self.assertAlmostEqual(np.exp(-3. / 2),
+                               laplacian_kernel(np.matrix(self.X[0]),
+                                                np.matrix(self.Y[0]), 2))
+
+        kernels = laplacian_kernel_matrix(self.X, self.Y, 2)
+        self.assertEqual((2, 3), kernels.shape)
+        for i, x in enumerate(self.X):
+            for j, y in enumerate(self.Y):
+                self.assertAlmostEqual(laplacian_kernel(x, y, 2),
+                                       kernels[i, j])
+
+    def test_gaussian_kernel(self):
+        self.assertAlmostEqual(np.exp(-5. / 8),
+                               gaussian_kernel(self.X[0], self.Y[0], 2))
+        self.assertAlmostEqual(np.exp(-5. / 8),
+                               gaussian_kernel(np.matrix(self.X[0]),
+                                               np.matrix(self.Y[0]), 2))
+
+        kernels = gaussian_kernel_matrix(self.X, self.Y, 2)
+        self.assertEqual((2, 3), kernels.shape)
+        for i, x in enumerate(self.X):
+            for j, y in enumerate(self.Y):
+                self.assertAlmostEqual(gaussian_kernel(x, y, 2),
+                                       kernels[i, j])
+
+        # Identical rows give a kernel of exactly one
+        kernels = gaussian_kernel_matrix(self.X, self.X, 0.1)
+        np.testing.assert_array_almost_equal([1, 1], np.diag(kernels))
+        self.assertTrue(np.all(kernels <= 1))
+
+
+if __name__ == "__main__":
+    unittest.main()